@@ -0,0 +1,123 @@
+"""Load benchmark of the query server
+
+    * This script starts the query server on a local ephemeral port,
+      sends concurrent requests, and reports the throughput and latency percentiles
+    * The requests are drawn from a fixed mix of date-range, rollup and cumulative queries,
+      so both cache hits and cache misses are measured
+
+"""
+import argparse
+import logging
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.request import urlopen
+
+from server import QueryServer, QueryService
+
+
+def make_queries(years: list[int], num_queries: int, seed: int = 0) -> list[str]:
+    "Generate the query paths of the benchmark over `years` in the dataset"
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(num_queries):
+        year = rng.choice(years)
+        fmt = rng.choice(["json", "csv"])
+        kind = rng.choice(["amounts", "rollup", "cumulative"])
+        if kind == "amounts":
+            month = rng.randint(1, 12)
+            queries.append(
+                f"/amounts?start={year}-{month:02d}-01&end={year}-12-31&format={fmt}"
+            )
+        elif kind == "rollup":
+            freq = rng.choice(["week", "month", "quarter", "year"])
+            queries.append(f"/rollup?freq={freq}&start={year}-01-01&format={fmt}")
+        else:
+            queries.append(f"/cumulative?end={year}-12-31&format={fmt}")
+    return queries
+
+
+def percentile(values: list[float], q: float) -> float:
+    "Nearest-rank percentile of `values`"
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def run(base_url: str, queries: list[str], concurrency: int) -> dict[str, float]:
+    """Send `queries` to `base_url` with `concurrency` workers
+
+    Returns:
+        dict[str, float]: throughput (req/s) and latency percentiles (ms)
+
+    """
+
+    def fetch(path: str) -> float:
+        started = time.perf_counter()
+        with urlopen(base_url + path) as res:
+            res.read()
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(fetch, queries))
+    elapsed = time.perf_counter() - started
+
+    latencies_ms = [t * 1000 for t in latencies]
+    return {
+        "requests": len(queries),
+        "throughput": len(queries) / elapsed,
+        "p50": statistics.median(latencies_ms),
+        "p99": percentile(latencies_ms, 99),
+        "max": max(latencies_ms),
+    }
+
+
+def main():
+    logger = logging.getLogger(__name__)
+
+    src_dir = Path(__file__).resolve().parent
+    project_root = src_dir.parent
+    processed_data_path = project_root.joinpath(
+        "data/processed/boj_etf_reit_amount.csv"
+    )
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--distinct", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--cache-size", type=int, default=256)
+    args = parser.parse_args()
+
+    service = QueryService(processed_data_path, cache_size=args.cache_size)
+    server = QueryServer(("127.0.0.1", 0), service)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    distinct = make_queries(service.years, args.distinct)
+    rng = random.Random(1)
+    queries = [rng.choice(distinct) for _ in range(args.requests)]
+
+    try:
+        for label, cache_size in [("cold", 0), ("cached", args.cache_size)]:
+            service.cache.clear()
+            service.cache.maxsize = cache_size
+            result = run(base_url, queries, args.concurrency)
+            logger.info(
+                f"{label}: {result['requests']} requests, "
+                f"{result['throughput']:.1f} req/s, "
+                f"p50 {result['p50']:.2f} ms, p99 {result['p99']:.2f} ms, "
+                f"max {result['max']:.2f} ms"
+            )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    LOG_FORMAT = "%(asctime)s- %(name)s - %(levelname)s - %(message)s"
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    main()
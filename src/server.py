@@ -0,0 +1,378 @@
+"""Query server of the processed dataset
+
+    * This script loads `data/processed/boj_etf_reit_amount.csv` once
+      and serves date-range, rollup and cumulative queries as JSON or CSV
+    * Query results are kept in an LRU cache, and ETags are tied to the dataset version
+    * The dataset is reloaded in the background when the processed file changes
+
+Endpoints:
+    * GET /amounts?start=YYYY-MM-DD&end=YYYY-MM-DD&format=json|csv
+    * GET /rollup?freq=week|month|quarter|year&start=...&end=...&format=...
+    * GET /cumulative?start=...&end=...&format=...
+
+"""
+import argparse
+import hashlib
+import io
+import json
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Hashable, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd  # type: ignore
+
+ENDPOINTS = ["amounts", "rollup", "cumulative"]
+AMOUNT_COLUMNS = ["IndexETF", "SupportiveETF", "J-REIT", "LendingETF"]
+ROLLUP_FREQS = {"week": "W", "month": "M", "quarter": "Q", "year": "Y"}
+CONTENT_TYPES = {"json": "application/json", "csv": "text/csv; charset=utf-8"}
+
+
+class QueryError(ValueError):
+    "Invalid query parameters"
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    "Immutable view of the dataset at a specific version"
+    version: str
+    df: pd.DataFrame
+    df_cumulative: pd.DataFrame
+
+
+class LRUCache:
+    """Thread-safe LRU cache of query results
+
+    Attributes:
+        maxsize (int): The maximum number of entries
+        hits (int): The number of cache hits
+        misses (int): The number of cache misses
+
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], bytes]) -> bytes:
+        "Return the cached value of `key`, or compute and store it"
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = compute()
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class QueryService:
+    """Query service over the processed CSV file
+
+    The service holds the dataset in memory as a `Snapshot`.
+    `reload_if_changed` swaps the snapshot when the content of the file changes,
+    so that the queries running concurrently always see a consistent dataset.
+
+    Attributes:
+        csv_path (Path): The path of the processed CSV file
+        cache (:obj: LRUCache): Cache of the encoded query results
+        logger (:obj: Logger): Logger
+
+    """
+
+    def __init__(self, csv_path: Path, *, cache_size: int = 256, logger=None):
+        self.csv_path = csv_path
+        self.cache = LRUCache(cache_size)
+        self.logger = logger or logging.getLogger(__name__)
+        self._stat: Optional[tuple[int, int]] = None
+        self._reload_lock = threading.Lock()
+        self._snapshot = self._load()
+
+    @property
+    def version(self) -> str:
+        return self._snapshot.version
+
+    @property
+    def years(self) -> list[int]:
+        "Distinct years in the current dataset"
+        return sorted(self._snapshot.df["Date"].dt.year.unique().tolist())
+
+    def _file_stat(self) -> tuple[int, int]:
+        st = self.csv_path.stat()
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self) -> Snapshot:
+        "Read the CSV file and build a new snapshot"
+        stat = self._file_stat()
+        content = self.csv_path.read_bytes()
+        version = hashlib.sha1(content).hexdigest()[:16]
+
+        # Parse the bytes already hashed so that the version matches the served data
+        df = pd.read_csv(io.BytesIO(content), parse_dates=["Date"])
+        df = df.sort_values("Date").reset_index(drop=True)[["Date"] + AMOUNT_COLUMNS]
+        df_cumulative = pd.concat(
+            [df["Date"], df[AMOUNT_COLUMNS].fillna(0.0).cumsum()], axis=1
+        ).assign(Total=lambda df: df["IndexETF"] + df["SupportiveETF"] + df["J-REIT"])
+
+        # Mark the file as seen only after it has been parsed successfully
+        self._stat = stat
+        self.logger.info(f"Loaded: {self.csv_path} (version {version})")
+        return Snapshot(version, df, df_cumulative)
+
+    def reload_if_changed(self) -> bool:
+        """Reload the dataset if the CSV file has been modified
+
+        Returns:
+            bool: True if a new version of the dataset has been loaded
+
+        """
+        with self._reload_lock:
+            try:
+                if self._file_stat() == self._stat:
+                    return False
+                snapshot = self._load()
+            except Exception:
+                # Keep serving the current snapshot (e.g. the file is being rewritten)
+                self.logger.exception(f"Failed to reload: {self.csv_path}")
+                return False
+
+            if snapshot.version == self._snapshot.version:
+                return False
+            self._snapshot = snapshot
+            self.cache.clear()
+            return True
+
+    @staticmethod
+    def _parse_date(params: dict[str, str], name: str) -> Optional[pd.Timestamp]:
+        if name not in params:
+            return None
+        try:
+            ts = pd.Timestamp(params[name])
+        except ValueError:
+            raise QueryError(f"Invalid date for `{name}`: {params[name]}") from None
+        if ts is pd.NaT or ts.tzinfo is not None:
+            raise QueryError(f"Invalid date for `{name}`: {params[name]}")
+        return ts
+
+    def _filter_dates(self, df: pd.DataFrame, params: dict[str, str]) -> pd.DataFrame:
+        start = self._parse_date(params, "start")
+        end = self._parse_date(params, "end")
+        if start is not None:
+            df = df[df["Date"] >= start]
+        if end is not None:
+            df = df[df["Date"] <= end]
+        return df
+
+    def _amounts(self, snapshot: Snapshot, params: dict[str, str]) -> pd.DataFrame:
+        df = self._filter_dates(snapshot.df, params)
+        return df.assign(Date=lambda df: df["Date"].dt.strftime("%Y-%m-%d"))
+
+    def _rollup(self, snapshot: Snapshot, params: dict[str, str]) -> pd.DataFrame:
+        freq = params.get("freq", "month")
+        if freq not in ROLLUP_FREQS:
+            raise QueryError(f"Invalid `freq`: {freq}")
+        df = self._filter_dates(snapshot.df, params)
+        periods = df["Date"].dt.to_period(ROLLUP_FREQS[freq]).rename("Period")
+        df_rollup = df.groupby(periods)[AMOUNT_COLUMNS].sum().reset_index()
+        return df_rollup.assign(Period=lambda df: df["Period"].astype(str))
+
+    def _cumulative(self, snapshot: Snapshot, params: dict[str, str]) -> pd.DataFrame:
+        df = self._filter_dates(snapshot.df_cumulative, params)
+        return df.assign(Date=lambda df: df["Date"].dt.strftime("%Y-%m-%d"))
+
+    def query(self, endpoint: str, params: dict[str, str]) -> tuple[str, bytes]:
+        """Run the query and return the encoded result
+
+        Args:
+            endpoint (str): One of `amounts`, `rollup` and `cumulative`
+            params (dict): Query parameters
+
+        Returns:
+            tuple[str, bytes]: The dataset version and the encoded result
+
+        Raises:
+            KeyError: If `endpoint` is unknown
+            QueryError: If `params` are invalid
+
+        """
+        if endpoint not in ENDPOINTS:
+            raise KeyError(f"Unknown endpoint: {endpoint}")
+        handler = getattr(self, f"_{endpoint}")
+        fmt = params.get("format", "json")
+        if fmt not in CONTENT_TYPES:
+            raise QueryError(f"Invalid `format`: {fmt}")
+
+        snapshot = self._snapshot
+
+        def compute() -> bytes:
+            df = handler(snapshot, params)
+            if fmt == "csv":
+                return df.to_csv(index=False).encode("utf-8")
+            return df.to_json(orient="records").encode("utf-8")
+
+        key = (snapshot.version, endpoint, tuple(sorted(params.items())))
+        return snapshot.version, self.cache.get_or_compute(key, compute)
+
+
+class Reloader(threading.Thread):
+    """Background thread polling the processed CSV file
+
+    Attributes:
+        service (:obj: QueryService): The service to reload
+        interval (float): Polling interval in seconds
+
+    """
+
+    def __init__(self, service: QueryService, interval: float = 5.0):
+        super().__init__(daemon=True)
+        self.service = service
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.service.reload_if_changed()
+
+    def stop(self):
+        self._stopped.set()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check `etag` against an `If-None-Match` header with the weak comparison
+
+    Args:
+        if_none_match (Optional[str]): The header value, e.g. `"abc", W/"def"` or `*`
+        etag (str): The current entity tag
+
+    Returns:
+        bool: True if the header matches `etag`
+
+    """
+    if if_none_match is None:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in tags:
+        return True
+    return etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    "HTTP handler dispatching the requests to `server.service`"
+
+    def log_message(self, format, *args):
+        self.server.service.logger.debug(format % args)  # type: ignore
+
+    def _send(self, status: HTTPStatus, body: bytes, headers: dict[str, str]):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: HTTPStatus, message: str):
+        body = json.dumps({"error": message}).encode("utf-8")
+        self._send(status, body, {"Content-Type": CONTENT_TYPES["json"]})
+
+    def do_GET(self):
+        service: QueryService = self.server.service  # type: ignore
+        url = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        endpoint = url.path.strip("/")
+        if endpoint not in ENDPOINTS:
+            self._send_error(HTTPStatus.NOT_FOUND, f"Unknown endpoint: {url.path}")
+            return
+
+        try:
+            version, body = service.query(endpoint, params)
+        except QueryError as e:
+            self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+        except Exception:
+            service.logger.exception(f"Failed to handle: {self.path}")
+            self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, "Internal server error")
+            return
+
+        etag = f'"{version}"'
+        if etag_matches(self.headers.get("If-None-Match"), etag):
+            self._send(HTTPStatus.NOT_MODIFIED, b"", {"ETag": etag})
+            return
+
+        headers = {
+            "Content-Type": CONTENT_TYPES[params.get("format", "json")],
+            "ETag": etag,
+            "Cache-Control": "no-cache",
+        }
+        self._send(HTTPStatus.OK, body, headers)
+
+
+class QueryServer(ThreadingHTTPServer):
+    "Threading HTTP server holding the query service"
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address: tuple[str, int], service: QueryService):
+        super().__init__(address, QueryRequestHandler)
+        self.service = service
+
+
+def main():
+    logger = logging.getLogger(__name__)
+
+    src_dir = Path(__file__).resolve().parent
+    project_root = src_dir.parent
+    processed_data_path = project_root.joinpath(
+        "data/processed/boj_etf_reit_amount.csv"
+    )
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cache-size", type=int, default=256)
+    parser.add_argument("--reload-interval", type=float, default=5.0)
+    args = parser.parse_args()
+
+    service = QueryService(
+        processed_data_path, cache_size=args.cache_size, logger=logger
+    )
+    reloader = Reloader(service, args.reload_interval)
+    reloader.start()
+
+    with QueryServer((args.host, args.port), service) as server:
+        logger.info(f"Serving on http://{args.host}:{server.server_address[1]}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            reloader.stop()
+
+
+if __name__ == "__main__":
+    LOG_FORMAT = "%(asctime)s- %(name)s - %(levelname)s - %(message)s"
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    main()
@@ -0,0 +1,203 @@
+import os
+import sys
+
+sys.path.append(
+    os.path.abspath(os.path.dirname(os.path.abspath(__file__)) + "/../src/")
+)
+
+import json
+import threading
+import time
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+import server
+from server import (
+    LRUCache,
+    QueryError,
+    QueryServer,
+    QueryService,
+    Reloader,
+    etag_matches,
+)
+
+CSV_CONTENT = """Date,IndexETF,SupportiveETF,J-REIT,LendingETF
+2021-01-04,501.0,12.0,,
+2021-01-05,,,12.0,
+2021-01-29,501.0,,,11.0
+2021-02-01,701.0,12.0,12.0,
+"""
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    target = tmp_path / "boj_etf_reit_amount.csv"
+    target.write_text(CSV_CONTENT)
+    return target
+
+
+@pytest.fixture
+def serve(csv_path):
+    service = QueryService(csv_path)
+    server = QueryServer(("127.0.0.1", 0), service)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield service, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def get_status(url, headers=None):
+    try:
+        with urlopen(Request(url, headers=headers or {})) as res:
+            return res.status
+    except HTTPError as e:
+        return e.code
+
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('"xyz", W/"abc"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"xyz"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+class TestLRUCache:
+    def test_eviction(self):
+        cache = LRUCache(2)
+        cache.get_or_compute("a", lambda: b"a")
+        cache.get_or_compute("b", lambda: b"b")
+        cache.get_or_compute("a", lambda: b"x")
+        cache.get_or_compute("c", lambda: b"c")
+        assert len(cache) == 2
+        assert cache.get_or_compute("a", lambda: b"x") == b"a"
+        assert cache.get_or_compute("b", lambda: b"y") == b"y"
+        assert cache.hits == 2
+        assert cache.misses == 4
+
+
+class TestQueryService:
+    def test_amounts(self, csv_path):
+        service = QueryService(csv_path)
+        _, body = service.query("amounts", {"start": "2021-01-05", "end": "2021-01-29"})
+        records = json.loads(body)
+        assert [r["Date"] for r in records] == ["2021-01-05", "2021-01-29"]
+        assert records[1]["LendingETF"] == 11.0
+
+    def test_rollup(self, csv_path):
+        service = QueryService(csv_path)
+        _, body = service.query("rollup", {"freq": "month", "format": "csv"})
+        lines = body.decode("utf-8").splitlines()
+        assert lines[0] == "Period,IndexETF,SupportiveETF,J-REIT,LendingETF"
+        assert lines[1] == "2021-01,1002.0,12.0,12.0,11.0"
+        assert lines[2] == "2021-02,701.0,12.0,12.0,0.0"
+
+    def test_cumulative(self, csv_path):
+        service = QueryService(csv_path)
+        _, body = service.query("cumulative", {"start": "2021-01-29"})
+        records = json.loads(body)
+        assert records[0]["IndexETF"] == 1002.0
+        assert records[-1]["Total"] == 1703.0 + 24.0 + 24.0
+
+    def test_invalid_params(self, csv_path):
+        service = QueryService(csv_path)
+        with pytest.raises(QueryError):
+            service.query("rollup", {"freq": "decade"})
+        with pytest.raises(QueryError):
+            service.query("amounts", {"start": "not-a-date"})
+        with pytest.raises(QueryError):
+            service.query("amounts", {"start": "NaT"})
+        with pytest.raises(QueryError):
+            service.query("amounts", {"start": "2021-01-01T00:00+09:00"})
+        with pytest.raises(KeyError):
+            service.query("unknown", {})
+
+    def test_cache_and_reload(self, csv_path):
+        service = QueryService(csv_path)
+        version, body = service.query("amounts", {})
+        assert service.query("amounts", {}) == (version, body)
+        assert service.cache.hits == 1
+
+        assert not service.reload_if_changed()
+        csv_path.write_text(CSV_CONTENT + "2021-02-02,701.0,,,\n")
+        os.utime(csv_path, ns=(0, 0))
+        assert service.reload_if_changed()
+        new_version, new_body = service.query("amounts", {})
+        assert new_version != version
+        assert len(json.loads(new_body)) == 5
+
+    def test_reload_retries_after_parse_error(self, csv_path, monkeypatch):
+        service = QueryService(csv_path)
+        version = service.version
+        csv_path.write_text(CSV_CONTENT + "2021-02-02,701.0,,,\n")
+
+        def broken(*args, **kwargs):
+            raise ValueError("truncated")
+
+        with monkeypatch.context() as m:
+            m.setattr(server.pd, "read_csv", broken)
+            assert not service.reload_if_changed()
+        assert service.version == version
+
+        # The same file is loaded again on the next poll
+        assert service.reload_if_changed()
+        assert service.version != version
+
+
+class TestQueryServer:
+    def test_http(self, serve):
+        service, base_url = serve
+        with urlopen(base_url + "/rollup?freq=year&format=csv") as res:
+            etag = res.headers["ETag"]
+            assert res.headers["Content-Type"].startswith("text/csv")
+            assert etag == f'"{service.version}"'
+
+        assert get_status(base_url + "/amounts", {"If-None-Match": etag}) == 304
+        assert get_status(base_url + "/amounts", {"If-None-Match": "W/" + etag}) == 304
+        assert get_status(base_url + "/amounts", {"If-None-Match": '"other"'}) == 200
+        assert get_status(base_url + "/unknown") == 404
+
+    def test_http_invalid_params(self, serve):
+        _, base_url = serve
+        invalid_queries = [
+            "/rollup?freq=decade",
+            "/amounts?format=xml",
+            "/amounts?start=NaT",
+            "/amounts?start=2021-01-01T00:00%2B09:00",
+        ]
+        for query in invalid_queries:
+            assert get_status(base_url + query) == 400
+            assert get_status(base_url + query, {"If-None-Match": "*"}) == 400
+
+    def test_http_internal_error(self, serve, monkeypatch):
+        service, base_url = serve
+
+        def broken(snapshot, params):
+            raise RuntimeError("broken")
+
+        monkeypatch.setattr(service, "_amounts", broken)
+        assert get_status(base_url + "/amounts") == 500
+        assert get_status(base_url + "/cumulative") == 200
+
+    def test_background_reload(self, csv_path, serve):
+        service, base_url = serve
+        with urlopen(base_url + "/amounts") as res:
+            etag = res.headers["ETag"]
+
+        reloader = Reloader(service, interval=0.01)
+        reloader.start()
+        try:
+            csv_path.write_text(CSV_CONTENT + "2021-02-02,701.0,,,\n")
+            os.utime(csv_path, ns=(0, 0))
+            deadline = time.monotonic() + 5.0
+            while f'"{service.version}"' == etag and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            reloader.stop()
+            reloader.join()
+
+        with urlopen(base_url + "/amounts") as res:
+            assert res.headers["ETag"] != etag
+            assert len(json.loads(res.read())) == 5